@@ -0,0 +1,24 @@
+# Converts claims_dict.pkl into a ClaimsBank folder that clsm_pytorch.py memory-maps
+# instead of unpickling the whole dictionary in every run.
+
+import argparse
+
+import joblib
+
+import pytorch_data_loader
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Convert a pickled claims dictionary into a memory-mappable claims bank.')
+    parser.add_argument("--claims-dict", help="Pickled claims dictionary to convert.", default="claims_dict.pkl")
+    parser.add_argument("--output", help="Folder to write the claims bank to.", default="claims_bank")
+    return parser.parse_args()
+
+if __name__=="__main__":
+    args = parse_args()
+
+    print("Loading {}...".format(args.claims_dict))
+    claims_dict = joblib.load(args.claims_dict)
+
+    claims_bank = pytorch_data_loader.ClaimsBank.from_dict(claims_dict)
+    claims_bank.save(args.output)
+    print("Wrote {:,} claims to {}".format(len(claims_bank), args.output))
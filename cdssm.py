@@ -91,8 +91,10 @@ class CDSSM(nn.Module):
         # To make it compatible with Conv layer we reshape it to: (batch_size, WORD_DEPTH, query_len)
         # print("Query initial shape: {}".format(q.shape))
         # print("Evidence initial shape: {}".format(pos.shape))
-        q = q.transpose(1,2)
-        pos = pos.transpose(1,2)
+        # relayout once here so the batch norm and the convolutions below all get a
+        # contiguous (batch_size, WORD_DEPTH, query_len) input instead of copying it themselves
+        q = q.transpose(1,2).contiguous()
+        pos = pos.transpose(1,2).contiguous()
         # print("Query reshape: {}".format(q.shape))
 
         # In this step, we transform each word vector with WORD_DEPTH dimensions into its
@@ -9,6 +9,7 @@
 # ## Preprocessing Data
 
 import argparse
+import contextlib
 import os
 import pickle
 import time
@@ -31,9 +32,10 @@ import torchvision.transforms as transforms
 from joblib import Parallel, delayed
 from scipy import sparse
 from sklearn.preprocessing import LabelEncoder, OneHotEncoder
-from sklearn.metrics import recall_score, classification_report, accuracy_score
+from sklearn.metrics import classification_report, accuracy_score
 from torch.autograd import Variable
 from torch.utils.data import DataLoader
+from torch.utils.data.distributed import DistributedSampler
 from tqdm import tqdm, tqdm_notebook
 
 import cdssm
@@ -51,13 +53,22 @@ def parse_args():
     parser.add_argument("--data-sampling", type=int, help="Number of examples per query.", default=3)
     parser.add_argument("--no-randomize", default=True, action="store_false", help="Disables randomly selecting documents from the data loader.")
     parser.add_argument("--learning-rate", type=float, help="Learning rate for model.", default=1e-4)
+    parser.add_argument("--accum-steps", type=int, help="Number of batches to accumulate gradients over per optimizer step.", default=1)
     parser.add_argument("--epochs", type=int, help="Number of epochs to learn for.", default=15)
     parser.add_argument("--data", help="Folder dataset to load file from.", default="data/large")
     parser.add_argument("--print", default=False, action="store_true", help="Whether to print predicted labels or not.")
     parser.add_argument("--sparse-evidences", default=False, action="store_true")
-    return parser.parse_args()
-
-def run(args, train, sparse_evidences, claims_dict):
+    parser.add_argument("--claims-bank", help="Folder of the memory-mapped claims bank (see build_claims_bank.py).", default="claims_bank")
+    parser.add_argument("--log-every-n-logsteps", type=int, help="Only write logged summaries every n-th output step.", default=1)
+    parser.add_argument("--log-histograms", default=False, action="store_true", help="Whether to log parameter and gradient histograms.")
+    args = parser.parse_args()
+    if args.accum_steps < 1:
+        parser.error("--accum-steps must be at least 1")
+    if args.log_every_n_logsteps < 1:
+        parser.error("--log-every-n-logsteps must be at least 1")
+    return args
+
+def run(args, train, sparse_evidences, claims_bank):
     BATCH_SIZE = args.batch_size
     LEARNING_RATE = args.learning_rate
     DATA_SAMPLING = args.data_sampling
@@ -65,45 +76,78 @@ def run(args, train, sparse_evidences, claims_dict):
     MODEL = args.model
     RANDOMIZE = args.no_randomize
     PRINT = args.print
+    ACCUM_STEPS = args.accum_steps
+    LOG_EVERY = args.log_every_n_logsteps
     
     use_cuda = torch.cuda.is_available()
-    device = torch.device("cuda:0" if use_cuda else "cpu")
 
-    logger = Logger('./logs/{}'.format(time.localtime()))
+    # launched through torchrun: one process per GPU with DistributedDataParallel
+    distributed = "LOCAL_RANK" in os.environ
+    if distributed:
+        local_rank = int(os.environ["LOCAL_RANK"])
+        torch.cuda.set_device(local_rank)
+        torch.distributed.init_process_group(backend="nccl")
+        device = torch.device("cuda:{}".format(local_rank))
+    else:
+        device = torch.device("cuda:0" if use_cuda else "cpu")
+    # only rank 0 prints progress, logs summaries and writes checkpoints
+    is_main = not distributed or torch.distributed.get_rank()==0
+
+    logger = Logger('./logs/{}'.format(time.strftime("%Y%m%d-%H%M%S"))) if is_main else None
 
     if MODEL:
         print("Loading pretrained model...")
         model = torch.load(MODEL)
-        model.load_state_dict(torch.load(MODEL).state_dict())
+        # older checkpoints pickled the DataParallel wrapper; new ones hold the bare model
+        model = getattr(model, "module", model)
+        # checkpoints are written from a host copy of the unwrapped model
+        model = model.to(device)
     else:
         model = cdssm.CDSSM()
-        model = model.cuda()
         model = model.to(device)
 
     # model = cdssm.CDSSM()
     # model = model.cuda()
     # model = model.to(device)
 
-    if torch.cuda.device_count() > 0:
+    if distributed:
+      print("Using DistributedDataParallel on GPU {}!".format(local_rank))
+      model = nn.parallel.DistributedDataParallel(model, device_ids=[local_rank])
+    elif torch.cuda.device_count() > 1:
       print("Let's use", torch.cuda.device_count(), "GPU(s)!")
       model = nn.DataParallel(model)
     
-    print("Created model with {:,} parameters.".format(putils.count_parameters(model)))
+    if is_main:
+        print("Created model with {:,} parameters.".format(putils.count_parameters(model)))
+
+    # fuse the forward pass with TorchInductor; `model` stays uncompiled for logging and checkpointing
+    compiled_model = putils.CompiledModel(model)
 
     # if MODEL:
         # print("TEMPORARY change to loading!")
         # model.load_state_dict(torch.load(MODEL).state_dict())
 
-    print("Created dataset...")
+    if is_main:
+        print("Created dataset...")
 
     # use an 80/20 train/validate split!
     train_size = int(len(train) * 0.80)
     #test = int(len(train) * 0.5)
-    train_dataset = pytorch_data_loader.WikiDataset(train[:train_size], claims_dict, data_sampling=DATA_SAMPLING, sparse_evidences=sparse_evidences, randomize=RANDOMIZE) 
-    val_dataset = pytorch_data_loader.WikiDataset(train[train_size:], claims_dict, data_sampling=DATA_SAMPLING, sparse_evidences=sparse_evidences, randomize=RANDOMIZE) 
-
-    train_dataloader = DataLoader(train_dataset, batch_size=BATCH_SIZE, num_workers=0, shuffle=True, collate_fn=pytorch_data_loader.PadCollate())
-    val_dataloader = DataLoader(val_dataset, batch_size=BATCH_SIZE, num_workers=0, shuffle=True, collate_fn=pytorch_data_loader.PadCollate())
+    train_dataset = pytorch_data_loader.WikiDataset(train[:train_size], claims_bank, data_sampling=DATA_SAMPLING, sparse_evidences=sparse_evidences, randomize=RANDOMIZE) 
+    val_dataset = pytorch_data_loader.WikiDataset(train[train_size:], claims_bank, data_sampling=DATA_SAMPLING, sparse_evidences=sparse_evidences, randomize=RANDOMIZE) 
+
+    # keep workers alive across epochs; prefetch_factor is capped at 4 since pinned batches add up in host memory
+    NUM_WORKERS = min(cpu_count(), 8)
+    # under DDP every process trains and validates on its own shard of the data. Validation is split
+    # by striding instead: DistributedSampler pads shards with repeated items, which would count them twice.
+    train_sampler = DistributedSampler(train_dataset) if distributed else None
+    val_sampler = list(range(torch.distributed.get_rank(), len(val_dataset), torch.distributed.get_world_size())) if distributed else None
+    train_dataloader = DataLoader(train_dataset, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS, prefetch_factor=4, persistent_workers=True, shuffle=(train_sampler is None), sampler=train_sampler, pin_memory=use_cuda, collate_fn=pytorch_data_loader.PadCollate())
+    val_dataloader = DataLoader(val_dataset, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS, prefetch_factor=4, persistent_workers=True, shuffle=(val_sampler is None), sampler=val_sampler, pin_memory=use_cuda, collate_fn=pytorch_data_loader.PadCollate())
+
+    # stage the next batch on the GPU while the current one is being computed
+    train_dataloader = pytorch_data_loader.WrappedDataLoader(train_dataloader, device)
+    val_dataloader = pytorch_data_loader.WrappedDataLoader(val_dataloader, device)
 
     # Loss and optimizer
     criterion = torch.nn.NLLLoss()
@@ -111,11 +155,13 @@ def run(args, train, sparse_evidences, claims_dict):
     # if torch.cuda.device_count() > 0:
         # print("Let's parallelize the backward pass...")
         # criterion = DataParallelCriterion(criterion)
-    optimizer = torch.optim.Adam(model.parameters(), lr=LEARNING_RATE, weight_decay=1e-3)
+    # the fused CUDA kernel (torch 2.0+, see requirements.txt) updates each parameter group in one launch
+    optimizer = torch.optim.Adam(model.parameters(), lr=LEARNING_RATE, weight_decay=1e-3, fused=use_cuda)
 
-    OUTPUT_FREQ = max(int((len(train_dataset)/BATCH_SIZE)*0.02), 20) 
-    parameters = {"batch size": BATCH_SIZE, "epochs": NUM_EPOCHS, "learning rate": LEARNING_RATE, "optimizer": optimizer.__class__.__name__, "loss": criterion.__class__.__name__, "training size": train_size, "data sampling rate": DATA_SAMPLING, "data": args.data, "sparse_evidences": args.sparse_evidences, "randomize": RANDOMIZE, "model": MODEL}
-    experiment = Experiment(api_key="YLsW4AvRTYGxzdDqlWRGCOhee", project_name="clsm", workspace="moinnadeem")
+    # len(train_dataloader) is this process's number of batches (its shard under DDP)
+    OUTPUT_FREQ = max(int(len(train_dataloader)*0.02), 20) 
+    parameters = {"batch size": BATCH_SIZE, "accumulation steps": ACCUM_STEPS, "epochs": NUM_EPOCHS, "learning rate": LEARNING_RATE, "optimizer": optimizer.__class__.__name__, "loss": criterion.__class__.__name__, "training size": train_size, "data sampling rate": DATA_SAMPLING, "data": args.data, "sparse_evidences": args.sparse_evidences, "randomize": RANDOMIZE, "model": MODEL}
+    experiment = Experiment(api_key="YLsW4AvRTYGxzdDqlWRGCOhee", project_name="clsm", workspace="moinnadeem", disabled=not is_main)
     experiment.add_tag("train")
     experiment.log_asset("cdssm.py")
     experiment.log_dataset_info(name=args.data)
@@ -128,15 +174,21 @@ def run(args, train, sparse_evidences, claims_dict):
         if key!="model":
             model_checkpoint_dir += "_{}-{}".format(key.replace(" ", "_"), value)
 
-    print("Training...")
+    # mixed precision: autocast the forward pass and scale the loss so fp16 gradients don't underflow
+    scaler = torch.cuda.amp.GradScaler(enabled=use_cuda)
+
+    if is_main:
+        print("Training...")
     beginning_time = time.time() 
     best_loss = torch.tensor(float("inf"), dtype=torch.float)  # begin loss at infinity
 
     for epoch in range(NUM_EPOCHS):
+        if distributed:
+            train_sampler.set_epoch(epoch)
         beginning_time = time.time()
-        mean_train_acc = 0.0
-        train_running_loss = 0.0
-        train_running_accuracy = 0.0
+        # running metrics stay on the device so the hot loop doesn't sync with the host every step
+        train_running_loss = torch.zeros((), device=device)
+        train_running_accuracy = torch.zeros((), device=device)
         model.train()
         experiment.log_current_epoch(epoch)
 
@@ -144,66 +196,72 @@ def run(args, train, sparse_evidences, claims_dict):
             for train_batch_num, inputs in enumerate(train_dataloader):
                 claims_tensors, claims_text, evidences_tensors, evidences_text, labels = inputs  
 
-                claims_tensors = claims_tensors.cuda()
-                evidences_tensors = evidences_tensors.cuda()
-                labels = labels.cuda()
-                #claims = claims.to(device).float()
-                #evidences = evidences.to(device).float()
-                #labels = labels.to(device)
+                # start a new accumulation window; gradients of the window's batches add up until the step below
+                window_start = train_batch_num - train_batch_num % ACCUM_STEPS
+                if train_batch_num == window_start:
+                    optimizer.zero_grad(set_to_none=True)
+                # the last window of an epoch may be short; it still gets its own step
+                window_size = min(ACCUM_STEPS, len(train_dataloader) - window_start)
+                is_boundary = train_batch_num + 1 == window_start + window_size
 
-                y_pred = model(claims_tensors, evidences_tensors)
+                # labels come out of PadCollate as float one-hot rows, (batch*data_sampling, 2)
+                y = labels
+                binary_y = torch.max(y, 1)[1]
 
-                y = (labels)
-                # y = y.unsqueeze(0)
-                # y = y.unsqueeze(0)
-                # y_pred = parallel.gather(y_pred, 0)
+                # under DDP only all-reduce gradients on the batch that ends the window
+                sync_context = model.no_sync() if distributed and not is_boundary else contextlib.nullcontext()
+                with sync_context:
+                    with torch.cuda.amp.autocast(enabled=use_cuda):
+                        # the model returns (batch*data_sampling, 1, 2)
+                        y_pred = compiled_model(claims_tensors, evidences_tensors).squeeze(1)
+                        loss = criterion(y_pred, binary_y)
 
-                y_pred = y_pred.squeeze()
-                # y = y.squeeze()
+                    scaler.scale(loss / window_size).backward()
 
-                loss = criterion(y_pred, torch.max(y,1)[1])
-                # loss = criterion(y_pred, y)
+                if is_boundary:
+                    # scaler.step unscales the gradients in place before stepping
+                    scaler.step(optimizer)
+                    scaler.update()
 
-                y = y.float()
-                binary_y = torch.max(y, 1)[1]
                 binary_pred = torch.max(y_pred, 1)[1]
-                accuracy = (binary_y==binary_pred).to("cuda")
-                accuracy = accuracy.float()
-                accuracy = accuracy.mean()
-                train_running_accuracy += accuracy.item()
-                mean_train_acc += accuracy.item()
-                train_running_loss += loss.item()
+                accuracy = (binary_y==binary_pred).float().mean()
+                train_running_accuracy += accuracy.detach()
+                train_running_loss += loss.detach()
 
 
-                if PRINT:
+                if PRINT and is_main:
                     for idx in range(len(y)): 
                         print("Claim: {}, Evidence: {}, Prediction: {}, Label: {}".format(claims_text[0], evidences_text[idx], torch.exp(y_pred[idx]), y[idx])) 
 
                 if (train_batch_num % OUTPUT_FREQ)==0 and train_batch_num>0:
-                    elapsed_time = time.time() - beginning_time
-                    binary_y = torch.max(y, 1)[1]
-                    binary_pred = torch.max(y_pred, 1)[1]
-                    print("[{}:{}:{:3f}s] training loss: {}, training accuracy: {}, training recall: {}".format(epoch, train_batch_num / (len(train_dataset)/BATCH_SIZE), elapsed_time, train_running_loss/OUTPUT_FREQ, train_running_accuracy/OUTPUT_FREQ, recall_score(binary_y.cpu().detach().numpy(), binary_pred.cpu().detach().numpy())))
-
-                    # 1. Log scalar values (scalar summary)
-                    info = { 'train_loss': train_running_loss/OUTPUT_FREQ, 'train_accuracy': train_running_accuracy/OUTPUT_FREQ }
-
-                    for tag, value in info.items():
-                       experiment.log_metric(tag, value, step=train_batch_num*(epoch+1))
-                       logger.scalar_summary(tag, value, train_batch_num+1)
-
-                    ## 2. Log values and gradients of the parameters (histogram summary)
-                    for tag, value in model.named_parameters():
-                        tag = tag.replace('.', '/')
-                        logger.histo_summary(tag, value.detach().cpu().numpy(), train_batch_num+1)
-                        logger.histo_summary(tag+'/grad', value.grad.detach().cpu().numpy(), train_batch_num+1)
-
-                    train_running_loss = 0.0
+                    if is_main:
+                        elapsed_time = time.time() - beginning_time
+                        train_loss = train_running_loss.item()/OUTPUT_FREQ
+                        train_accuracy = train_running_accuracy.item()/OUTPUT_FREQ
+                        print("[{}:{}:{:3f}s] training loss: {}, training accuracy: {}, training recall: {}".format(epoch, train_batch_num / len(train_dataloader), elapsed_time, train_loss, train_accuracy, putils.recall_gpu(binary_y, binary_pred)))
+
+                        # summaries are only written every LOG_EVERY-th logging step
+                        if (train_batch_num // OUTPUT_FREQ) % LOG_EVERY == 0:
+                            # 1. Log scalar values (scalar summary)
+                            info = { 'train_loss': train_loss, 'train_accuracy': train_accuracy }
+
+                            for tag, value in info.items():
+                               experiment.log_metric(tag, value, step=train_batch_num*(epoch+1))
+                               logger.scalar_summary(tag, value, train_batch_num+1)
+
+                            ## 2. Log values and gradients of the parameters (histogram summary)
+                            if args.log_histograms:
+                                # mid-window gradients are still multiplied by the loss scale
+                                grad_scale = 1.0 if is_boundary else scaler.get_scale()
+                                for tag, value in model.named_parameters():
+                                    tag = tag.replace('.', '/')
+                                    logger.histo_summary_tensor(tag, value, train_batch_num+1)
+                                    logger.histo_summary_tensor(tag+'/grad', value.grad / grad_scale, train_batch_num+1)
+                            logger.flush()
+
+                    train_running_loss.zero_()
                     beginning_time = time.time() 
-                    train_running_accuracy = 0.0
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
+                    train_running_accuracy.zero_()
 
         # del loss
         # del accuracy
@@ -217,7 +275,8 @@ def run(args, train, sparse_evidences, claims_dict):
         # torch.cuda.empty_cache()
 
 
-        print("Running validation...")
+        if is_main:
+            print("Running validation...")
         model.eval()
         pred = []
         true = []
@@ -225,53 +284,47 @@ def run(args, train, sparse_evidences, claims_dict):
         val_running_accuracy = 0.0
         val_running_loss = 0.0
         beginning_time = time.time()
-        with experiment.validate():
+        # no autograd graph or saved activations are needed to score the validation set
+        with experiment.validate(), torch.inference_mode():
             for val_batch_num, val_inputs in enumerate(val_dataloader):
                 claims_tensors, claims_text, evidences_tensors, evidences_text, labels = val_inputs  
 
-                claims_tensors = claims_tensors.cuda()
-                evidences_tensors = evidences_tensors.cuda()
-                labels = labels.cuda()
-
-                y_pred = model(claims_tensors, evidences_tensors)
-
-                y = (labels)
-                # y_pred = parallel.gather(y_pred, 0)
-
-                y_pred = y_pred.squeeze()
-
-                loss = criterion(y_pred, torch.max(y,1)[1])
+                y = labels
+                binary_y = torch.max(y, 1)[1]
 
-                y = y.float()
+                y_pred = compiled_model(claims_tensors, evidences_tensors).squeeze(1)
+                loss = criterion(y_pred, binary_y)
 
-                binary_y = torch.max(y, 1)[1]
                 binary_pred = torch.max(y_pred, 1)[1]
                 true.extend(binary_y.tolist())
                 pred.extend(binary_pred.tolist())
 
-                accuracy = (binary_y==binary_pred).to("cuda")
-
-                accuracy = accuracy.float().mean()
+                accuracy = (binary_y==binary_pred).float().mean()
                 val_running_accuracy += accuracy.item()
                 val_running_loss += loss.item() 
-                avg_loss += loss.item()
+                # sum per-item losses; batches differ in size, and under DDP so do the shards
+                avg_loss += loss.item() * len(binary_y)
 
                 if (val_batch_num % OUTPUT_FREQ)==0 and val_batch_num>0:
-                    elapsed_time = time.time() - beginning_time
-                    print("[{}:{}:{:3f}s] validation loss: {}, accuracy: {}, recall: {}".format(epoch, val_batch_num / (len(val_dataset)/BATCH_SIZE), elapsed_time, val_running_loss/OUTPUT_FREQ, val_running_accuracy/OUTPUT_FREQ, recall_score(binary_y.cpu().detach().numpy(), binary_pred.cpu().detach().numpy())))
-
-                    # 1. Log scalar values (scalar summary)
-                    info = { 'val_accuracy': val_running_accuracy/OUTPUT_FREQ }
-
-                    for tag, value in info.items():
-                       experiment.log_metric(tag, value, step=val_batch_num*(epoch+1))
-                       logger.scalar_summary(tag, value, val_batch_num+1)
-
-                    ## 2. Log values and gradients of the parameters (histogram summary)
-                    for tag, value in model.named_parameters():
-                       tag = tag.replace('.', '/')
-                       logger.histo_summary(tag, value.detach().cpu().numpy(), val_batch_num+1)
-                       logger.histo_summary(tag+'/grad', value.grad.detach().cpu().numpy(), val_batch_num+1)
+                    if is_main:
+                        elapsed_time = time.time() - beginning_time
+                        print("[{}:{}:{:3f}s] validation loss: {}, accuracy: {}, recall: {}".format(epoch, val_batch_num / len(val_dataloader), elapsed_time, val_running_loss/OUTPUT_FREQ, val_running_accuracy/OUTPUT_FREQ, putils.recall_gpu(binary_y, binary_pred)))
+
+                        if (val_batch_num // OUTPUT_FREQ) % LOG_EVERY == 0:
+                            # 1. Log scalar values (scalar summary)
+                            info = { 'val_accuracy': val_running_accuracy/OUTPUT_FREQ }
+
+                            for tag, value in info.items():
+                               experiment.log_metric(tag, value, step=val_batch_num*(epoch+1))
+                               logger.scalar_summary(tag, value, val_batch_num+1)
+
+                            ## 2. Log values of the parameters (histogram summary); nothing runs backward here,
+                            ## so .grad would only repeat the last training step's gradients
+                            if args.log_histograms:
+                                for tag, value in model.named_parameters():
+                                   tag = tag.replace('.', '/')
+                                   logger.histo_summary_tensor(tag, value, val_batch_num+1)
+                            logger.flush()
 
                     val_running_accuracy = 0.0
                     val_running_loss = 0.0
@@ -288,17 +341,32 @@ def run(args, train, sparse_evidences, claims_dict):
         # del y_pred
         # torch.cuda.empty_cache()
 
-        accuracy = accuracy_score(true, pred) 
-        print("[{}] mean accuracy: {}, mean loss: {}".format(epoch, accuracy, avg_loss / len(val_dataloader)))
+        if distributed:
+            # combine every rank's validation shard so all ranks agree on the epoch's loss
+            shards = [None] * torch.distributed.get_world_size()
+            torch.distributed.all_gather_object(shards, (true, pred, avg_loss))
+            true = [t for shard in shards for t in shard[0]]
+            pred = [p for shard in shards for p in shard[1]]
+            avg_loss = sum(shard[2] for shard in shards)
+        num_val_items = len(true)
+
+        best_loss = torch.tensor(min(avg_loss / num_val_items, best_loss.cpu().numpy()))
+        is_best = bool((avg_loss / num_val_items) <= best_loss)
+
+        if is_main:
+            accuracy = accuracy_score(true, pred) 
+            print("[{}] mean accuracy: {}, mean loss: {}".format(epoch, accuracy, avg_loss / num_val_items))
 
-        true = np.array(true).astype("int") 
-        pred = np.array(pred).astype("int") 
-        print(classification_report(true, pred))
+            true = np.array(true).astype("int") 
+            pred = np.array(pred).astype("int") 
+            print(classification_report(true, pred))
 
-        best_loss = torch.tensor(min(avg_loss / len(val_dataloader), best_loss.cpu().numpy()))
-        is_best = bool((avg_loss / len(val_dataloader)) <= best_loss)
-        
-        putils.save_checkpoint({"epoch": epoch, "model": model, "best_loss": best_loss}, is_best, filename="{}_loss_{}".format(model_checkpoint_dir, best_loss.cpu().numpy()))
+            putils.save_checkpoint({"epoch": epoch, "model": model, "best_loss": best_loss}, is_best, filename="{}_loss_{}".format(model_checkpoint_dir, best_loss.cpu().numpy()))
+
+    # don't return (and let the process exit) while the last best checkpoint is still being written
+    putils.wait_for_checkpoint()
+    if distributed:
+        torch.distributed.destroy_process_group()
 
 if __name__=="__main__":
     args = parse_args()
@@ -315,11 +383,16 @@ if __name__=="__main__":
     else:
         sparse_evidences = None
 
-    try:
-        claims_dict
-    except:
+    if os.path.isdir(args.claims_bank):
+        print("Memory-mapping claims bank {}...".format(args.claims_bank))
+        claims_bank = pytorch_data_loader.ClaimsBank.load(args.claims_bank)
+    else:
         print("Loading claims data...")
         claims_dict = joblib.load("claims_dict.pkl")
 
+        # pack the claims once so both datasets (and every worker) share flat arrays
+        claims_bank = pytorch_data_loader.ClaimsBank.from_dict(claims_dict)
+        del claims_dict
+
     # torch.multiprocessing.set_start_method("spawn", force=True)
-    run(args, train, sparse_evidences, claims_dict)
+    run(args, train, sparse_evidences, claims_bank)
@@ -62,7 +62,7 @@ def run():
     use_cuda = torch.cuda.is_available()
     device = torch.device("cuda" if use_cuda else "cpu")
 
-    logger = Logger('./logs/{}'.format(time.localtime()))
+    logger = Logger('./logs/{}'.format(time.strftime("%Y%m%d-%H%M%S")))
 
     print("Created model...")
     model = cdssm.CDSSM()
@@ -104,7 +104,8 @@ def run():
         y = y.squeeze()
         y = y.view(-1)
         y_pred = y_pred.view(-1)
-        bin_acc = torch.sigmoid(y_pred).round()
+        # sigmoid is monotone, so thresholding the logit at 0 gives the same labels
+        bin_acc = (y_pred > 0).float()
 
         loss = criterion(y_pred, y)
 
@@ -1,46 +1,26 @@
 # Code referenced from https://gist.github.com/gyglim/1f8dfb1b5c82627ae3efcfbbadb9f514
-import tensorflow as tf
+# Ported from the TF1-only tf.summary.FileWriter to torch's own TensorBoard writer, which only needs the tensorboard package
 import numpy as np
-import scipy.misc 
-try:
-    from StringIO import StringIO  # Python 2.7
-except ImportError:
-    from io import BytesIO         # Python 3.x
+import torch
+from torch.utils.tensorboard import SummaryWriter
 
 
 class Logger(object):
     
     def __init__(self, log_dir):
         """Create a summary writer logging to log_dir."""
-        self.writer = tf.summary.FileWriter(log_dir)
+        self.writer = SummaryWriter(log_dir)
 
     def scalar_summary(self, tag, value, step):
         """Log a scalar variable."""
-        summary = tf.Summary(value=[tf.Summary.Value(tag=tag, simple_value=value)])
-        self.writer.add_summary(summary, step)
+        self.writer.add_scalar(tag, value, step)
 
     def image_summary(self, tag, images, step):
         """Log a list of images."""
 
-        img_summaries = []
         for i, img in enumerate(images):
-            # Write the image to a string
-            try:
-                s = StringIO()
-            except:
-                s = BytesIO()
-            scipy.misc.toimage(img).save(s, format="png")
-
-            # Create an Image object
-            img_sum = tf.Summary.Image(encoded_image_string=s.getvalue(),
-                                       height=img.shape[0],
-                                       width=img.shape[1])
-            # Create a Summary value
-            img_summaries.append(tf.Summary.Value(tag='%s/%d' % (tag, i), image=img_sum))
-
-        # Create and write Summary
-        summary = tf.Summary(value=img_summaries)
-        self.writer.add_summary(summary, step)
+            # images are (height, width) or (height, width, channels)
+            self.writer.add_image('%s/%d' % (tag, i), img, step, dataformats="HW" if img.ndim == 2 else "HWC")
         
     def histo_summary(self, tag, values, step, bins=1000):
         """Log a histogram of the tensor of values."""
@@ -48,24 +28,32 @@ class Logger(object):
         # Create a histogram using numpy
         counts, bin_edges = np.histogram(values, bins=bins)
 
-        # Fill the fields of the histogram proto
-        hist = tf.HistogramProto()
-        hist.min = float(np.min(values))
-        hist.max = float(np.max(values))
-        hist.num = int(np.prod(values.shape))
-        hist.sum = float(np.sum(values))
-        hist.sum_squares = float(np.sum(values**2))
+        self._write_histogram(tag, step, counts, bin_edges, np.min(values), np.max(values),
+                              np.prod(values.shape), np.sum(values), np.sum(values**2))
+        self.flush()
+
+    def histo_summary_tensor(self, tag, values, step, bins=1000):
+        """Log a histogram of a torch tensor, binned on its own device so only the counts are copied back.
+        Unlike histo_summary this doesn't flush; call flush() once after logging a batch of histograms."""
+        values = values.detach().float()
+
+        vmin, vmax, vsum, vsum_squares = torch.stack([values.min(), values.max(), values.sum(), (values**2).sum()]).tolist()
+
+        # same range numpy picks for a constant array
+        lo, hi = (vmin - 0.5, vmax + 0.5) if vmin == vmax else (vmin, vmax)
+        counts = torch.histc(values, bins=bins, min=lo, max=hi).cpu().numpy()
+        bin_edges = np.linspace(lo, hi, bins + 1)
+
+        self._write_histogram(tag, step, counts, bin_edges, vmin, vmax, values.numel(), vsum, vsum_squares)
 
-        # Drop the start of the first bin
+    def _write_histogram(self, tag, step, counts, bin_edges, vmin, vmax, num, vsum, vsum_squares):
+        # Drop the start of the first bin, so each bucket is described by its upper limit
         bin_edges = bin_edges[1:]
 
-        # Add bin edges and counts
-        for edge in bin_edges:
-            hist.bucket_limit.append(edge)
-        for c in counts:
-            hist.bucket.append(c)
+        self.writer.add_histogram_raw(tag, min=float(vmin), max=float(vmax), num=int(num), sum=float(vsum),
+                                      sum_squares=float(vsum_squares), bucket_limits=[float(e) for e in bin_edges],
+                                      bucket_counts=[float(c) for c in counts], global_step=step)
 
-        # Create and write Summary
-        summary = tf.Summary(value=[tf.Summary.Value(tag=tag, histo=hist)])
-        self.writer.add_summary(summary, step)
+    def flush(self):
+        """Write pending summaries to disk."""
         self.writer.flush()
\ No newline at end of file
@@ -1,3 +1,6 @@
+import json
+import os
+
 import joblib
 import numpy as np
 import torch
@@ -73,11 +76,43 @@ def pad_tensor(vec, pad, dim):
     # pad_size = list(vec.shape)
     # pad_size[dim] = pad 
     padding = torch.nn.ZeroPad2d((0, 0, 0, pad - vec.size(dim)))
-    return padding(vec).cuda()
+    return padding(vec)
     
     # return zeros_tensor
     # return torch.cat([vec, zeros_tensor], dim=dim)
 
+def pad_stack(tensors, dim=0):
+    """
+    args:
+        tensors - list of tensors that only differ in size along 'dim'
+        dim - dimension to pad
+
+    return:
+        a single tensor of shape (len(tensors), ...) with each tensor
+        copied into a zero buffer padded to the longest one in 'dim'
+    """
+    max_len = max(t.shape[dim] for t in tensors)
+    size = list(tensors[0].shape)
+    size[dim] = max_len
+
+    if tensors[0].is_sparse:
+        # padding a sparse tensor is free: prepend the batch index to every
+        # nonzero and let the larger shape cover the padding
+        indices = []
+        values = []
+        for idx, t in enumerate(tensors):
+            t = t.coalesce()  # no-op for tensors from to_sparse_coo
+            t_indices = t.indices()
+            batch_index = t_indices.new_full((1, t_indices.shape[1]), idx)
+            indices.append(torch.cat([batch_index, t_indices], dim=0))
+            values.append(t.values())
+        return torch.sparse_coo_tensor(torch.cat(indices, dim=1), torch.cat(values), [len(tensors)] + size)
+
+    out = tensors[0].new_zeros([len(tensors)] + size)
+    for idx, t in enumerate(tensors):
+        out[idx].narrow(dim, 0, t.shape[dim]).copy_(t)
+    return out
+
 class PadCollate:
     """
     a variant of callate_fn that pads according to the longest sequence in
@@ -114,24 +149,180 @@ class PadCollate:
             evidences_text.extend(item[3])
             labels.extend(item[4])
 
-        batched_items = []
-
-        for tensor in [claims_tensors, evidences_tensors]:
-            # find longest sequence
-            max_len = max(map(lambda x: x.shape[self.dim], tensor))
-
-            # pad according to max_len
-            batched_items.append(list(map(lambda x: pad_tensor(x, pad=max_len, dim=self.dim), tensor)))
-
-        # stack all
-        claims_tensors = torch.stack(batched_items[0], dim=0).cuda()
-        evidences_tensors = torch.stack(batched_items[1], dim=0).cuda()
-        labels = torch.tensor(labels, dtype=torch.float).cuda()
+        # pad and stack into one preallocated buffer each; tensors stay on
+        # the host so the DataLoader can pin them
+        claims_tensors = pad_stack(claims_tensors, dim=self.dim)
+        evidences_tensors = pad_stack(evidences_tensors, dim=self.dim)
+        labels = torch.tensor(labels, dtype=torch.float)
         return [claims_tensors, claims_text, evidences_tensors, evidences_text, labels] 
 
     def __call__(self, batch):
         return self.pad_collate(batch)
 
+class WrappedDataLoader:
+    """
+    Wraps a DataLoader so that the next batch is copied to the GPU on a
+    separate stream while the current batch is being used.
+    """
+
+    def __init__(self, dataloader, device):
+        """
+        args:
+            dataloader - a DataLoader yielding host (ideally pinned) batches
+            device - the device to move batches to
+        """
+        self.dataloader = dataloader
+        self.device = device
+        if device.type == "cuda":
+            self.memcpy_stream = torch.cuda.Stream(device)
+        else:
+            self.memcpy_stream = None
+
+    def __len__(self):
+        return len(self.dataloader)
+
+    def __iter__(self):
+        self.iterator = iter(self.dataloader)
+        self.next_batch = self._get_next_batch()
+        return self
+
+    def _to_device(self, batch):
+        out = []
+        for item in batch:
+            if torch.is_tensor(item):
+                item = item.to(self.device, non_blocking=True)
+                # sparse evidences cross the bus as COO and are only densified on the device
+                if item.is_sparse:
+                    item = item.to_dense()
+            out.append(item)
+        return out
+
+    def _get_next_batch(self):
+        try:
+            batch = next(self.iterator)
+        except StopIteration:
+            return None
+
+        if self.memcpy_stream is None:
+            return self._to_device(batch)
+
+        with torch.cuda.stream(self.memcpy_stream):
+            return self._to_device(batch)
+
+    def __next__(self):
+        batch = self.next_batch
+        if batch is None:
+            raise StopIteration
+
+        if self.memcpy_stream is not None:
+            # make the compute stream wait for the copy, and keep the copied
+            # tensors alive until the compute stream is done with them
+            current_stream = torch.cuda.current_stream(self.device)
+            current_stream.wait_stream(self.memcpy_stream)
+            for item in batch:
+                if torch.is_tensor(item):
+                    item.record_stream(current_stream)
+
+        self.next_batch = self._get_next_batch()
+        return batch
+
+class ClaimsBank:
+    """
+    Stores every claim's sparse encoding in a few flat arrays (the CSR
+    arrays of all claims stacked together) instead of one scipy matrix
+    per claim. Looking up a claim is then a slice of those arrays.
+    """
+
+    ARRAYS = ("claim_offsets", "indptr", "indices", "data")
+
+    def __init__(self, claim_to_id, claim_offsets, indptr, indices, data, width):
+        """
+        args:
+            claim_to_id - dict mapping claim text to its id
+            claim_offsets - (num_claims+1,) first row of each claim in the stacked matrix
+            indptr - (num_rows+1,) CSR row pointers of the stacked matrix
+            indices - (nnz,) int32 column (letter-trigram) ids
+            data - (nnz,) float32 values
+            width - number of columns of each claim matrix
+        """
+        self.claim_to_id = claim_to_id
+        self.claim_offsets = claim_offsets
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.width = width
+
+    @classmethod
+    def from_dict(cls, claims_dict):
+        """
+        args:
+            claims_dict - dict mapping claim text to a sparse matrix
+
+        return:
+            a ClaimsBank holding the same encodings
+        """
+        claims = list(claims_dict.keys())
+        matrices = [sparse.csr_matrix(claims_dict[c]) for c in claims]
+        stacked = sparse.vstack(matrices, format="csr")
+
+        claim_offsets = np.zeros(len(matrices)+1, dtype=np.int64)
+        claim_offsets[1:] = np.cumsum([m.shape[0] for m in matrices])
+
+        return cls({c: idx for idx, c in enumerate(claims)},
+                   claim_offsets,
+                   stacked.indptr.astype(np.int64),
+                   stacked.indices.astype(np.int32),
+                   stacked.data.astype(np.float32),
+                   stacked.shape[1])
+
+    def save(self, directory):
+        """
+        args:
+            directory - folder to write the bank's arrays (.npy) and claim texts (claims.json) to
+        """
+        os.makedirs(directory, exist_ok=True)
+        claims = sorted(self.claim_to_id, key=self.claim_to_id.get)
+        with open(os.path.join(directory, "claims.json"), "w") as f:
+            json.dump({"width": int(self.width), "claims": claims}, f)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, "{}.npy".format(name)), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """
+        args:
+            directory - folder written by ClaimsBank.save
+            mmap_mode - passed to np.load; memory-mapped arrays live in the
+                page cache and are shared by every DataLoader worker
+
+        return:
+            a ClaimsBank backed by the saved arrays
+        """
+        with open(os.path.join(directory, "claims.json")) as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(directory, "{}.npy".format(name)), mmap_mode=mmap_mode) for name in cls.ARRAYS]
+        return cls({c: idx for idx, c in enumerate(meta["claims"])}, *arrays, meta["width"])
+
+    def __len__(self):
+        return len(self.claim_to_id)
+
+    def __contains__(self, claim):
+        return claim in self.claim_to_id
+
+    def __getitem__(self, claim):
+        """
+        return:
+            a dense float32 (num_rows, width) array for the claim
+        """
+        cid = self.claim_to_id[claim]
+        lo, hi = self.claim_offsets[cid], self.claim_offsets[cid+1]
+        start, end = self.indptr[lo], self.indptr[hi]
+
+        rows = np.repeat(np.arange(hi - lo), np.diff(self.indptr[lo:hi+1]))
+        dense = np.zeros((hi - lo, self.width), dtype=np.float32)
+        dense[rows, self.indices[start:end]] = self.data[start:end]
+        return dense
+
 class WikiDataset(Dataset):
     """
     Generates data with batch size of 1 sample for the purposes of training our model.
@@ -156,7 +347,10 @@ class WikiDataset(Dataset):
         self.device = torch.device("cuda:0" if use_cuda else "cpu")
         self.data_sampling = data_sampling 
         self.encoder = utils.ClaimEncoder()
-        self.claims_dict = claims_dict
+        if isinstance(claims_dict, ClaimsBank):
+            self.claims_bank = claims_dict
+        else:
+            self.claims_bank = ClaimsBank.from_dict(claims_dict)
         self.batch_size = batch_size
         self.collate_fn = PadCollate()
         _, _, _, _, self.claim_to_article = utils.extract_fever_jsonl_data(testFile)
@@ -175,9 +369,8 @@ class WikiDataset(Dataset):
         #claim = utils.preprocess_article_name(d['claim'])  # preprocess the claim
         #claim = self.encoder.tokenize_claim(claim)
         #claim = sparse.vstack(claim).toarray()  # turn it into a array
-        claim = self.claims_dict[d['claim']]
-        claim = claim.toarray()
-        claim = torch.from_numpy(claim).cuda().float()
+        claim = self.claims_bank[d['claim']]
+        claim = torch.from_numpy(claim)
         claim_text = d['claim']
         #claim = sparse.vstack(self.encoder.tokenize_claim(utils.preprocess_article_name(d['claim']))).toarray()
 
@@ -198,11 +391,9 @@ class WikiDataset(Dataset):
                     print("Claim: {}, evidence {} is missing!".format(d['claim'], processed)) 
                     return self.get_item(index+1)
             else:
-                evidence = self.encoder.tokenize_claim(processed)
-                evidence = sparse.vstack(evidence)
+                evidence = self.encoder.encode_claim(processed)
 
-            evidence = evidence.toarray()
-            evidence = torch.from_numpy(evidence).cuda().float()
+            evidence = to_sparse_coo(evidence)
 
             evidence_text.append(processed)
             evidence_tensors.append(evidence)
@@ -232,13 +423,10 @@ class WikiDataset(Dataset):
                         raise Exception("You fucked up somewhere")
 
                 else: 
-                    evidence = self.encoder.tokenize_claim(processed)
-                    if len(evidence)>0:
-                        evidence = sparse.vstack(evidence)
+                    evidence = self.encoder.encode_claim(processed)
 
             if evidence.shape[0]>0:
-                evidence = evidence.toarray()
-                evidence = torch.from_numpy(evidence).cuda().float()
+                evidence = to_sparse_coo(evidence)
                 evidence_tensors.append(evidence)
                 evidence_text.append(processed)
 
@@ -262,6 +450,19 @@ class WikiDataset(Dataset):
         #np.random.shuffle(self.indicies)
         pass
 
+def to_sparse_coo(M):
+    """
+    args:
+        M - a scipy sparse matrix
+
+    return:
+        the same matrix as a coalesced float32 torch sparse COO tensor on the host
+    """
+    M = M.tocoo().astype(np.float32)
+    indices = torch.from_numpy(np.vstack((M.row, M.col))).long()
+    values = torch.from_numpy(M.data)
+    return torch.sparse_coo_tensor(indices, values, M.shape).coalesce()
+
 def to_torch_sparse_tensor(M, device="cuda"):
     M = M.tocoo().astype(np.float32)
     indices = torch.from_numpy(np.vstack((M.row, M.col))).cuda().long()
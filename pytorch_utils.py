@@ -1,17 +1,79 @@
+import copy
+import threading
+
 import torch
 import torch.nn
 
+# the checkpoint currently being written in the background, if any
+_save_thread = None
+
 def count_parameters(model):
     return sum(p.numel() for p in model.parameters() if p.requires_grad)
 
+def recall_gpu(y, pred):
+    """Binary recall of 0/1 tensors, computed on their device. Only the final scalar is copied back."""
+    tp = ((y==1) & (pred==1)).sum()
+    fn = ((y==1) & (pred==0)).sum()
+    return (tp.float() / (tp + fn).clamp(min=1).float()).item()
+
+class CompiledModel(object):
+    """
+    Calls a torch.compile'd model, falling back to the eager model for good if compilation
+    isn't available or fails. Dynamo compiles lazily, so most failures only show up on a forward call.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        try:
+            # dynamic shapes: PadCollate pads every batch to a different length. No CUDA graphs
+            # ("reduce-overhead"), which would record a new graph and memory pool per shape.
+            self.compiled = torch.compile(model, dynamic=True)
+            # backend/compile failures are wrapped in this; errors raised by the model itself are not
+            self.compile_errors = torch._dynamo.exc.TorchDynamoException
+        except (AttributeError, RuntimeError) as e:
+            print("torch.compile is unavailable ({}), running the model eagerly.".format(e))
+            self.compiled = None
+
+    def __call__(self, *inputs):
+        if self.compiled is None:
+            return self.model(*inputs)
+        try:
+            return self.compiled(*inputs)
+        except self.compile_errors as e:
+            print("torch.compile failed ({}), running the model eagerly.".format(e))
+            self.compiled = None
+            return self.model(*inputs)
+
 def save_checkpoint(state, is_best, filename='/output/checkpoint.pth.tar'):
-    """Save checkpoint if a new best is achieved"""
+    """Save checkpoint if a new best is achieved; the file is written on a background thread"""
     if is_best:
         print ("=> Saving a new best")
-        torch.save(state['model'], filename)  # save checkpoint
+        # snapshot the weights on the host now, so training can keep updating the live model
+        model = state['model']
+        model = getattr(model, 'module', model)  # unwrap DataParallel / DistributedDataParallel
+        # copy the tensors straight to host memory; deepcopy then reuses them via the memo,
+        # so no second copy of the weights (or their grads) is made on the GPU. copy=True because
+        # .cpu() of a CPU tensor shares its storage, and the optimizer would update the "snapshot" too.
+        memo = {id(p): torch.nn.Parameter(p.detach().to("cpu", copy=True), requires_grad=p.requires_grad) for p in model.parameters()}
+        memo.update({id(b): b.detach().to("cpu", copy=True) for b in model.buffers()})
+        snapshot = copy.deepcopy(model, memo)
+        _bg_save(snapshot, filename)  # save checkpoint
     else:
         print ("=> Validation Accuracy did not improve")
 
+def _bg_save(obj, filename):
+    """torch.save obj on a background thread, waiting for any earlier save to finish first"""
+    global _save_thread
+    wait_for_checkpoint()
+    # not a daemon, so the interpreter waits for the last checkpoint to be fully written
+    _save_thread = threading.Thread(target=torch.save, args=(obj, filename))
+    _save_thread.start()
+
+def wait_for_checkpoint():
+    """Block until the background checkpoint save (if any) is done"""
+    if _save_thread is not None:
+        _save_thread.join()
+
 class ContrastiveLoss(torch.nn.Module):
     """
     Contrastive loss function.
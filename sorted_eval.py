@@ -65,11 +65,14 @@ def run():
     use_cuda = torch.cuda.is_available()
     device = torch.device("cuda:0" if use_cuda else "cpu")
 
-    logger = Logger('./logs/{}'.format(time.localtime()))
+    logger = Logger('./logs/{}'.format(time.strftime("%Y%m%d-%H%M%S")))
 
     print("Created model...")
     if MODEL:
-        model = torch.load(MODEL).module
+        model = torch.load(MODEL)
+        # older checkpoints pickled the DataParallel wrapper, newer ones the bare CDSSM on the host
+        model = getattr(model, "module", model)
+        model = model.to(device)
     else:
         model = cdssm.CDSSM()
         model = model.cuda()
@@ -125,7 +128,8 @@ def run():
             loss = criterion(y_pred, torch.max(y,1)[1])
             test_running_loss += loss.item()
 
-            y_pred = torch.exp(y_pred)
+            # y_pred holds log-probabilities; exp is monotone, so argmax and the
+            # ranking below work on them directly
             binary_y = torch.max(y, 1)[1]
             binary_y_pred = torch.max(y_pred, 1)[1]
             accuracy = (binary_y==binary_y_pred).to(device)
@@ -168,7 +172,7 @@ def run():
 
             if args.print:      
                 for idx in sorted_idxs: 
-                    print("Claim: {}, Evidence: {}, Prediction: {}, Label: {}".format(claims_text[0], evidences_text[idx], y_pred[idx], y[idx])) 
+                    print("Claim: {}, Evidence: {}, Prediction: {}, Label: {}".format(claims_text[0], evidences_text[idx], torch.exp(y_pred[idx]), y[idx])) 
 
             # compute recall
             # assuming only one claim, this creates a list of all relevant evidences
@@ -1,3 +1,4 @@
+import collections
 import unicodedata
 import json
 import unicodedata
@@ -12,6 +13,9 @@ from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm.autonotebook import tqdm 
 
 FEVER_LABELS = {'SUPPORTS': 0, 'REFUTES': 1}
+# words kept in each ClaimEncoder's letter-gram cache; every DataLoader worker holds its own copy,
+# so it is bounded instead of growing to the whole evidence vocabulary
+WORD_CACHE_SIZE = 2**15
 
 def tokenize_helper(inp):
     print(inp)
@@ -21,6 +25,7 @@ class ClaimEncoder(object):
     def __init__(self):
         self.feature_encoder = joblib.load("feature_encoder.pkl")
         self.encoder = joblib.load("encoder.pkl")
+        self.word_cache = collections.OrderedDict()  # least recently used word first
             
     def tokenize_claim(self, c):
         """
@@ -43,6 +48,54 @@ class ClaimEncoder(object):
                     arr[idx, letter_idx] = 1
             encoded_vector.append(arr)
         return encoded_vector
+
+    def word_letter_grams(self, word):
+        """
+        Input: a single word
+        Output: sorted, unique letter-gram ids of the word (memoized for the WORD_CACHE_SIZE most recently
+        used words, words repeat a lot across evidences)
+        """
+        if word in self.word_cache:
+            self.word_cache.move_to_end(word)
+            return self.word_cache[word]
+        ids = []
+        for letter_gram in nltk.ngrams("#" + word + "#", 3):
+            s = "".join(letter_gram)
+            if s in self.feature_encoder:
+                ids.append(self.feature_encoder[s])
+            else:
+                ids.append(self.feature_encoder['OOV'])
+        self.word_cache[word] = np.unique(np.array(ids, dtype=np.int32))
+        if len(self.word_cache) > WORD_CACHE_SIZE:
+            self.word_cache.popitem(last=False)
+        return self.word_cache[word]
+
+    def encode_claim(self, c):
+        """
+        Input: a string that represents a single claim
+        Output: the same matrix as sparse.vstack(self.tokenize_claim(c)), built in one pass as a CSR matrix
+        with 3 rows per word trigram (zero rows if the claim has fewer than three tokens).
+        """
+        c = preprocess_article_name(c)
+        c = "! {} !".format(c)
+        word_ids = [self.word_letter_grams(w) for w in nltk.word_tokenize(c)]
+
+        rows = []
+        cols = []
+        num_rows = 0
+        for ngram in nltk.ngrams(word_ids, 3):
+            for ids in ngram:
+                rows.append(np.full(len(ids), num_rows, dtype=np.int32))
+                cols.append(ids)
+                num_rows += 1
+
+        shape = (num_rows, len(self.encoder.__dict__['classes_']))
+        if num_rows==0:
+            return sparse.csr_matrix(shape, dtype=np.float64)
+
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=shape)
     
     def create_encodings(self, claims, train_dict, write_to_file=False):
         processed_claims = generate_all_tokens(claims)
@@ -230,9 +283,8 @@ def process(evidence, encoder):
         processed = preprocess_article_name(evidence.split("http://wikipedia.org/wiki/")[1])
     else:
         processed = preprocess_article_name(evidence)
-    evidence = encoder.tokenize_claim(processed)
-    if len(evidence)>0:
-        evidence = sparse.vstack(evidence)
+    evidence = encoder.encode_claim(processed)
+    if evidence.shape[0]>0:
         return processed, evidence
     return None
 